@@ -29,6 +29,16 @@ def _env_int(name: str, default: int) -> int:
     except ValueError:
         return default
 
+def _env_float(name: str, default: float) -> float:
+    """Парсинг дробного значения из ENV."""
+    raw = os.getenv(name)
+    if raw is None or str(raw).strip() == "":
+        return default
+    try:
+        return float(str(raw).strip())
+    except ValueError:
+        return default
+
 def _env_str(name: str, default: str) -> str:
     """Парсинг строки из ENV."""
     raw = os.getenv(name)
@@ -65,3 +75,22 @@ LEAGUES = _env_leagues("LEAGUES", _DEFAULT_LEAGUES)
 
 # Файл результата
 OUT_CSV = Path(_env_str("OUT_CSV", "OUT/teams_corners.csv"))
+
+# Записи по матчам (JSON Lines) — источник для `main.py report`
+MATCH_RESULTS = Path(_env_str("MATCH_RESULTS", "OUT/match_results.jsonl"))
+
+# Распределённый режим (coordinator/worker)
+JOB_KINDS = ("team", "match")  # типы заданий: команда целиком или отдельный матч
+QUEUE_URL = _env_str("QUEUE_URL", "sqlite:///OUT/work_queue.db")
+LEASE_TIMEOUT_S = _env_int("LEASE_TIMEOUT_S", 120)
+JOB_TIMEOUT_S = _env_int("JOB_TIMEOUT_S", 600)
+JOB_MAX_ATTEMPTS = _env_int("JOB_MAX_ATTEMPTS", 3)
+QUEUE_POLL_MS = _env_int("QUEUE_POLL_MS", 1000)
+WORKER_IDLE_TIMEOUT_S = _env_int("WORKER_IDLE_TIMEOUT_S", 60)
+
+# Профилирование медленных страниц (PROFILE_DIR пусто = выключено)
+PROFILE_DIR = _env_str("PROFILE_DIR", "")
+TRACE_SLOW_MS = _env_int("TRACE_SLOW_MS", 5000)          # трасса для матчей медленнее порога
+TRACE_SAMPLE_RATE = _env_float("TRACE_SAMPLE_RATE", 0.0)  # доля обычных матчей с трассой (0..1)
+PROFILE_CPU = _env_bool("PROFILE_CPU", False)              # cProfile по event loop
+LOOP_STALL_MS = _env_int("LOOP_STALL_MS", 0)               # лог колбэков event loop дольше порога; 0 = выкл.
@@ -1,8 +1,9 @@
 """
 Агрегация и сохранение CSV.
 """
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, List, Tuple
 import csv
+import json
 from pathlib import Path
 
 
@@ -37,3 +38,59 @@ def write_averages_csv(rows: List[Tuple[str, float, float, float]], path: Path):
         w = csv.writer(f, lineterminator="\n")
         for name, avg_total, avg_team, avg_opp in rows:
             w.writerow([name, f"{avg_total:.2f}", f"{avg_team:.2f}", f"{avg_opp:.2f}"])
+
+
+def select_match_records(records: Iterable[Dict], per_team_limit: int | None = None) -> List[Dict]:
+    """Убираем повторы (команда, матч) и оставляем первые per_team_limit записей каждой команды."""
+    out: List[Dict] = []
+    seen = set()
+    taken: Dict[str, int] = {}
+    for r in records:
+        key = (r["team"], r.get("match_id") or r.get("url"))
+        if key in seen:
+            continue
+        seen.add(key)
+        if per_team_limit is not None and taken.get(r["team"], 0) >= per_team_limit:
+            continue
+        taken[r["team"]] = taken.get(r["team"], 0) + 1
+        out.append(r)
+    return out
+
+
+def build_team_agg(records: Iterable[Dict]) -> Dict[str, Dict]:
+    """Агрегаты команд из записей по матчам; повторы (команда, матч) учитываем один раз."""
+    teams_agg: Dict[str, Dict] = {}
+    seen = set()
+    for r in records:
+        key = (r["team"], r.get("match_id") or r.get("url"))
+        if key in seen:
+            continue
+        seen.add(key)
+        update_team_agg(teams_agg, r["team"], r["team_corners"], r["opp_corners"])
+    return teams_agg
+
+
+def write_match_results(records: Iterable[Dict], path: Path):
+    """Сохраняем записи по матчам (JSON Lines) для последующего пересчёта отчёта."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for r in records:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def read_match_results(path: Path) -> List[Dict]:
+    """Читаем записи по матчам, сохранённые write_match_results."""
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_report(teams_agg: Dict[str, Dict], out_csv_path: Path):
+    """Считаем итоговую таблицу, пишем CSV и печатаем её."""
+    table = compute_sorted_table(teams_agg)
+    write_averages_csv(table, out_csv_path)
+
+    print(f"\n[OK] Готово. Итоговый CSV: {out_csv_path.resolve()}")
+    if table:
+        print("\nПолная таблица (все команды, отсортировано по среднему тоталу ↓):")
+        for i, (name, avg_total, avg_team, avg_opp) in enumerate(table, start=1):
+            print(f"{i:>2}. {name}: {avg_total:.2f} (инд: {avg_team:.2f}, соп: {avg_opp:.2f})")
@@ -0,0 +1,287 @@
+"""
+Распределённый режим: координатор раздаёт задания через общую очередь, воркеры на любых хостах их выполняют.
+
+Задания:
+    team  — {"team", "link", "matches"}: process_team по команде целиком (до matches матчей);
+    match — {"team", "url"}:             один матч команды (parse_match_corners).
+Результат задания — список записей по матчам (см. parse_team_match). Координатор ставит задания
+на все матчи-кандидаты и, как process_team, берёт первые N успешных записей каждой команды.
+
+process_team не падает на отдельных матчах, поэтому неполное задание team считается неудачей
+(IncompleteJobError) и возвращается в очередь; на последней попытке принимаем частичный результат,
+а задание без единой записи уходит в «dead».
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from playwright.async_api import async_playwright, BrowserContext
+
+from app import config
+from app.services.aggregator import build_team_agg, save_report, select_match_records, write_match_results
+from app.services.pipeline import (
+    new_context,
+    launch_browser,
+    collect_teams,
+    list_team_matches,
+    process_team,
+    process_match,
+)
+from app.services.profiling import RunProfiler, make_profiler
+from app.services.work_queue import (
+    WorkQueue,
+    PENDING,
+    LEASED,
+    DEAD,
+    RUN_PREPARING,
+    RUN_ACTIVE,
+    RUN_FINISHED,
+)
+
+
+class IncompleteJobError(RuntimeError):
+    """Задание team собрало меньше матчей, чем было доступно."""
+
+
+# Временные ошибки SQLite на общем диске; остальные (нет файла, нет таблицы) повторять бессмысленно
+_RETRYABLE_SQLITE_ERRORS = ("database is locked", "database is busy", "database table is locked")
+QUEUE_CALL_ATTEMPTS = 8
+
+
+async def _queue_call(method, *args):
+    """Вызов метода очереди в потоке; при блокировке SQLite — до QUEUE_CALL_ATTEMPTS попыток с паузой."""
+    delay_s = 1.0
+    for attempt in range(1, QUEUE_CALL_ATTEMPTS + 1):
+        try:
+            return await asyncio.to_thread(method, *args)
+        except sqlite3.OperationalError as e:
+            if attempt == QUEUE_CALL_ATTEMPTS or not str(e).startswith(_RETRYABLE_SQLITE_ERRORS):
+                raise
+            print(f"[QUEUE] {method.__name__}: {e}; повтор через {delay_s:.0f} с")
+            await asyncio.sleep(delay_s)
+            delay_s = min(delay_s * 2, 30.0)
+
+
+async def run_coordinator(
+    queue: WorkQueue,
+    leagues: List[str] | None = None,
+    headless: bool | None = None,
+    team_limit: int | None = None,
+    matches_per_team: int | None = None,
+    job_kind: str = "team",
+    out_csv: str | None = None,
+    results_path: str | None = None,
+):
+    """Собираем команды, ставим задания в очередь, ждём воркеров и пишем итоговый CSV."""
+    if job_kind not in config.JOB_KINDS:
+        raise ValueError(f"Неизвестный тип заданий: {job_kind}")
+    leagues = leagues or config.LEAGUES
+    headless = config.HEADLESS if headless is None else headless
+    if team_limit is None:
+        team_limit = config.TEAM_LIMIT
+    matches_per_team = matches_per_team or config.MATCHES_PER_TEAM
+    out_csv_path = config.OUT_CSV if out_csv is None else Path(out_csv)
+    results_file = config.MATCH_RESULTS if results_path is None else Path(results_path)
+
+    # Очищаем очередь и отмечаем подготовку сразу: воркеры ждут заданий, пока мы обходим лиги
+    await _queue_call(queue.clear)
+    await _queue_call(queue.set_run_state, RUN_PREPARING)
+    try:
+        async with async_playwright() as pw:
+            browser, context = await launch_browser(pw, headless)
+            all_teams = await collect_teams(context, leagues, team_limit)
+
+            jobs: List[Dict] = []
+            for team_name, team_link in all_teams:
+                if job_kind == "team":
+                    jobs.append({"team": team_name, "link": team_link, "matches": matches_per_team})
+                    continue
+                try:
+                    links = await list_team_matches(context, team_link)
+                except Exception:
+                    print(f"   - [{team_name}] не удалось получить список матчей")
+                    continue
+                # Все кандидаты: часть матчей может не распарситься, лимит применяется к результатам
+                jobs.extend({"team": team_name, "url": href} for href in links)
+
+            await context.close()
+            await browser.close()
+
+        for payload in jobs:
+            await _queue_call(queue.enqueue, job_kind, payload)
+        await _queue_call(queue.set_run_state, RUN_ACTIVE)
+        print(f"\n[QUEUE] Поставлено заданий ({job_kind}): {len(jobs)}")
+
+        last_stats: Dict[str, int] | None = None
+        while True:
+            await _queue_call(queue.requeue_expired)
+            stats = await _queue_call(queue.stats)
+            if stats != last_stats:
+                print(f"[QUEUE] {stats}")
+                last_stats = stats
+            if stats.get(PENDING, 0) == 0 and stats.get(LEASED, 0) == 0:
+                break
+            await asyncio.sleep(config.QUEUE_POLL_MS / 1000)
+
+        if stats.get(DEAD, 0):
+            print(f"[WARN] Заданий без результата (исчерпаны попытки): {stats[DEAD]}")
+    finally:
+        await _queue_call(queue.set_run_state, RUN_FINISHED)
+
+    results = await _queue_call(queue.results)
+    # Результаты идут в порядке заданий, т.е. в порядке матчей-кандидатов каждой команды
+    records = select_match_records(
+        (r for _job_id, job_records in results for r in job_records or []),
+        per_team_limit=matches_per_team,
+    )
+    write_match_results(records, results_file)
+    save_report(build_team_agg(records), out_csv_path)
+
+
+async def execute_job(
+    context: BrowserContext,
+    job: Dict,
+    profiler: Optional[RunProfiler] = None,
+    accept_partial: bool = False,
+) -> List[Dict]:
+    """Выполняем задание и возвращаем записи по матчам.
+
+    accept_partial — принять неполный (но не пустой) результат задания team, обычно на последней попытке.
+    """
+    if profiler is None:
+        return await _execute_job(context, job, accept_partial=accept_partial)
+    # См. RunProfiler.trace_match: контекст с трассировкой не делим с другими слотами
+    job_context = await new_context(context.browser)
+    try:
+        return await _execute_job(job_context, job, profiler, accept_partial)
+    finally:
+        await job_context.close()
+
+
+async def _execute_job(
+    context: BrowserContext,
+    job: Dict,
+    profiler: Optional[RunProfiler] = None,
+    accept_partial: bool = False,
+) -> List[Dict]:
+    """Разбор задания по типу (team/match)."""
+    payload = job["payload"]
+    if job["kind"] == "team":
+        records: List[Dict] = []
+        candidates: List[int] = []
+        matches = payload.get("matches") or config.MATCHES_PER_TEAM
+        await process_team(
+            context, payload["team"], payload["link"], {}, asyncio.Lock(),
+            on_match=records.append, on_candidates=candidates.append,
+            profiler=profiler, matches_per_team=matches,
+        )
+        expected = min(matches, candidates[0]) if candidates else 0
+        if expected and (not records or (len(records) < expected and not accept_partial)):
+            raise IncompleteJobError(f"собрано матчей {len(records)} из {expected}")
+        return records
+    if job["kind"] == "match":
+        record = await process_match(context, payload["team"], payload["url"], profiler)
+        return [record] if record else []
+    raise ValueError(f"Неизвестный тип задания: {job['kind']}")
+
+
+async def _keep_lease(queue: WorkQueue, job: Dict, lease_s: int):
+    """Продлеваем аренду, пока задание выполняется."""
+    while True:
+        await asyncio.sleep(max(1.0, lease_s / 3))
+        if not await _queue_call(queue.heartbeat, job["id"], job["token"], lease_s):
+            return
+
+
+async def _run_job(
+    queue: WorkQueue,
+    context: BrowserContext,
+    job: Dict,
+    lease_s: int,
+    job_timeout_s: int,
+    profiler: Optional[RunProfiler] = None,
+):
+    """Выполняем одно арендованное задание и отдаём результат (или неудачу) в очередь."""
+    keeper = asyncio.create_task(_keep_lease(queue, job, lease_s))
+    try:
+        accept_partial = job["attempts"] >= queue.max_attempts
+        records = await asyncio.wait_for(
+            execute_job(context, job, profiler, accept_partial), timeout=job_timeout_s,
+        )
+    except Exception as e:
+        keeper.cancel()
+        print(f"   - [job {job['id']}] ошибка (попытка {job['attempts']}): {e!r}")
+        await _queue_call(queue.fail, job["id"], job["token"], repr(e))
+        return
+    keeper.cancel()
+    if not await _queue_call(queue.complete, job["id"], job["token"], records):
+        print(f"   - [job {job['id']}] аренда потеряна, результат отброшен")
+
+
+async def run_worker(
+    queue: WorkQueue,
+    worker_id: str | None = None,
+    headless: bool | None = None,
+    concurrency: int | None = None,
+    lease_s: int | None = None,
+    job_timeout_s: int | None = None,
+    idle_timeout_s: int | None = None,
+    profile_dir: str | None = None,
+):
+    """Берём задания из очереди, пока координатор не завершит запуск.
+
+    Простой считается только при активном запуске и пустой очереди: пока координатор готовит
+    задания или у других воркеров есть аренды (их задания могут вернуться), воркер ждёт.
+    idle_timeout_s страхует от упавшего координатора.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    headless = config.HEADLESS if headless is None else headless
+    concurrency = concurrency or config.TEAMS_CONCURRENCY
+    lease_s = lease_s or config.LEASE_TIMEOUT_S
+    job_timeout_s = job_timeout_s or config.JOB_TIMEOUT_S
+    idle_timeout_s = config.WORKER_IDLE_TIMEOUT_S if idle_timeout_s is None else idle_timeout_s
+    done = 0
+    profiler = make_profiler(profile_dir)
+
+    # RUN_FINISHED от прошлого запуска не должен останавливать воркера, стартовавшего раньше координатора
+    seen_run = False
+
+    async def slot(context: BrowserContext):
+        nonlocal done, seen_run
+        idle_since = time.monotonic()
+        while True:
+            job: Optional[Dict] = await _queue_call(queue.lease, worker_id, lease_s)
+            if job is None:
+                state = await _queue_call(queue.run_state)
+                if state in (RUN_PREPARING, RUN_ACTIVE):
+                    seen_run = True
+                if state == RUN_FINISHED and seen_run:
+                    return
+                if state == RUN_PREPARING or (state == RUN_ACTIVE and not await _queue_call(queue.is_drained)):
+                    idle_since = time.monotonic()
+                elif time.monotonic() - idle_since >= idle_timeout_s:
+                    return
+                await asyncio.sleep(config.QUEUE_POLL_MS / 1000)
+                continue
+            seen_run = True
+            await _run_job(queue, context, job, lease_s, job_timeout_s, profiler)
+            done += 1
+            idle_since = time.monotonic()
+
+    print(f"[WORKER {worker_id}] старт, слотов: {concurrency}")
+    if profiler is not None:
+        profiler.start()
+    try:
+        async with async_playwright() as pw:
+            browser, context = await launch_browser(pw, headless)
+            await asyncio.gather(*(slot(context) for _ in range(concurrency)))
+            await context.close()
+            await browser.close()
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    print(f"[WORKER {worker_id}] очередь пуста, обработано заданий: {done}")
@@ -2,9 +2,10 @@
 Основной пайплайн: сбор команд, парсинг матчей и сохранение результатов.
 """
 import asyncio
-from typing import Dict, List, Tuple
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
 
 from app import config
 from app.scraper.teams_extractor import get_team_links
@@ -14,61 +15,116 @@ from app.scraper.match_parser import (
     parse_match_corners,
 )
 from app.scraper.navigation import goto_smart
-from app.services.aggregator import update_team_agg, compute_sorted_table, write_averages_csv
+from app.services.aggregator import update_team_agg, save_report, write_match_results
+from app.services.profiling import RunProfiler, make_profiler
 from app.utils import norm_for_compare, tiny_sleep, normalize_match_stats_url
 
 
+def resolve_team_corners(team_name: str, data: Dict) -> Optional[Tuple[int, int]]:
+    """Определяем, за кого играла команда в матче: возвращаем (угловые команды, угловые соперника)."""
+    src = norm_for_compare(team_name)
+    home_n = norm_for_compare(data.get("home_team") or "")
+    away_n = norm_for_compare(data.get("away_team") or "")
+
+    if src == home_n:
+        return data["home_corners"], data["away_corners"]
+    if src == away_n:
+        return data["away_corners"], data["home_corners"]
+    if src and (src in home_n):
+        return data["home_corners"], data["away_corners"]
+    if src and (src in away_n):
+        return data["away_corners"], data["home_corners"]
+    return None
+
+
+async def new_team_page(context: BrowserContext) -> Page:
+    """Новая вкладка с таймаутами из config."""
+    page: Page = await context.new_page()
+    page.set_default_navigation_timeout(config.NAV_TIMEOUT_MS)
+    page.set_default_timeout(config.DEF_TIMEOUT_MS)
+    return page
+
+
+async def parse_team_match(
+    page: Page,
+    team_name: str,
+    match_url: str,
+    profiler: Optional[RunProfiler] = None,
+) -> Optional[Dict]:
+    """Открываем матч и возвращаем запись по угловым для команды (или None)."""
+    if profiler is None:
+        return await _parse_team_match(page, team_name, match_url)
+    async with profiler.trace_match(page.context, team_name, match_url) as rec:
+        record = await _parse_team_match(page, team_name, match_url)
+        rec["ok"] = record is not None
+        return record
+
+
+async def _parse_team_match(page: Page, team_name: str, match_url: str) -> Optional[Dict]:
+    url = normalize_match_stats_url(match_url)
+    await goto_smart(page, url, lambda p: p.wait_for_timeout(100), config.NAV_TIMEOUT_MS)
+    await tiny_sleep()
+
+    data = await parse_match_corners(page)
+    if not data or data["home_corners"] is None or data["away_corners"] is None:
+        return None
+
+    sides = resolve_team_corners(team_name, data)
+    if sides is None:
+        return None
+    team_c, opp_c = sides
+    return {
+        "team": team_name,
+        "match_id": data["match_id"],
+        "url": data["url"],
+        "team_corners": team_c,
+        "opp_corners": opp_c,
+    }
+
+
 async def process_team(
     context: BrowserContext,
     team_name: str,
     team_link: str,
     teams_agg: Dict[str, Dict],
     agg_lock: asyncio.Lock,
+    on_match: Optional[Callable[[Dict], None]] = None,
+    on_candidates: Optional[Callable[[int], None]] = None,
+    profiler: Optional[RunProfiler] = None,
+    matches_per_team: int | None = None,
 ) -> int:
-    """Обрабатываем одну команду: собираем до N матчей и агрегируем угловые."""
-    page: Page = await context.new_page()
-    page.set_default_navigation_timeout(config.NAV_TIMEOUT_MS)
-    page.set_default_timeout(config.DEF_TIMEOUT_MS)
+    """Обрабатываем одну команду: собираем до N матчей и агрегируем угловые.
+
+    on_match (если задан) получает запись каждого учтённого матча,
+    on_candidates — число найденных ссылок на матчи.
+    profiler (если задан) пишет трассы матчей — контекст должен принадлежать только этой команде.
+    """
+    matches_per_team = matches_per_team or config.MATCHES_PER_TEAM
+    page = await new_team_page(context)
 
     taken = 0
     try:
         await goto_smart(page, team_link, wait_team_page_ready, config.NAV_TIMEOUT_MS)
 
         candidates = await get_second_decade_event_links(page)
+        if on_candidates is not None:
+            on_candidates(len(candidates))
         if not candidates:
             print(f"   - [{team_name}] нет ссылок eventRowLink")
             return 0
 
         for href in candidates:
-            if taken >= config.MATCHES_PER_TEAM:
+            if taken >= matches_per_team:
                 break
-            url = normalize_match_stats_url(href)
             try:
-                await goto_smart(page, url, lambda p: p.wait_for_timeout(100), config.NAV_TIMEOUT_MS)
-                await tiny_sleep()
-
-                data = await parse_match_corners(page)
-                if not data or data["home_corners"] is None or data["away_corners"] is None:
+                record = await parse_team_match(page, team_name, href, profiler)
+                if record is None:
                     continue
 
-                src = norm_for_compare(team_name)
-                home_n = norm_for_compare(data.get("home_team") or "")
-                away_n = norm_for_compare(data.get("away_team") or "")
-
-                if src == home_n:
-                    team_c, opp_c = data["home_corners"], data["away_corners"]
-                elif src == away_n:
-                    team_c, opp_c = data["away_corners"], data["home_corners"]
-                else:
-                    if src and (src in home_n):
-                        team_c, opp_c = data["home_corners"], data["away_corners"]
-                    elif src and (src in away_n):
-                        team_c, opp_c = data["away_corners"], data["home_corners"]
-                    else:
-                        continue
-
                 async with agg_lock:
-                    update_team_agg(teams_agg, team_name, team_c, opp_c)
+                    update_team_agg(teams_agg, team_name, record["team_corners"], record["opp_corners"])
+                if on_match is not None:
+                    on_match(record)
 
                 taken += 1
             except Exception:
@@ -80,6 +136,72 @@ async def process_team(
         await page.close()
 
 
+async def process_match(
+    context: BrowserContext,
+    team_name: str,
+    match_url: str,
+    profiler: Optional[RunProfiler] = None,
+) -> Optional[Dict]:
+    """Обрабатываем один матч команды в отдельной вкладке."""
+    page = await new_team_page(context)
+    try:
+        return await parse_team_match(page, team_name, match_url, profiler)
+    finally:
+        await page.close()
+
+
+async def list_team_matches(context: BrowserContext, team_link: str) -> List[str]:
+    """Ссылки на матчи команды (без их парсинга)."""
+    page = await new_team_page(context)
+    try:
+        await goto_smart(page, team_link, wait_team_page_ready, config.NAV_TIMEOUT_MS)
+        return await get_second_decade_event_links(page)
+    finally:
+        await page.close()
+
+
+async def new_context(browser: Browser) -> BrowserContext:
+    """Контекст браузера с общими настройками (UA, локаль, окно)."""
+    return await browser.new_context(
+        user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                    "AppleWebKit/537.36 (KHTML, like Gecko) "
+                    "Chrome/123.0.0.0 Safari/537.36"),
+        locale="ru-RU",
+        viewport={"width": 1400, "height": 900},
+    )
+
+
+async def launch_browser(pw: Playwright, headless: bool) -> Tuple[Browser, BrowserContext]:
+    """Запуск Chromium и контекста с общими настройками."""
+    browser: Browser = await pw.chromium.launch(
+        headless=headless,
+        args=["--disable-blink-features=AutomationControlled", "--no-sandbox"],
+    )
+    return browser, await new_context(browser)
+
+
+async def collect_teams(
+    context: BrowserContext,
+    leagues: List[str],
+    team_limit: int | None,
+) -> List[Tuple[str, str]]:
+    """Собираем (Название, URL) команд по всем лигам."""
+    league_page = await new_team_page(context)
+
+    all_teams: List[Tuple[str, str]] = []
+    for lid, league_url in enumerate(leagues, start=1):
+        print(f"\n[LEAGUE {lid}/{len(leagues)}] {league_url}")
+        teams = await get_team_links(league_page, league_url)
+        print(f"[INFO] Найдено команд: {len(teams)}")
+        if team_limit is not None:
+            teams = teams[:team_limit]
+            print(f"[INFO] Ограничение: берём первые {len(teams)} команд")
+        all_teams.extend(teams)
+
+    await league_page.close()
+    return all_teams
+
+
 async def run(
     leagues: List[str] | None = None,
     headless: bool | None = None,
@@ -87,6 +209,8 @@ async def run(
     matches_per_team: int | None = None,
     concurrency: int | None = None,
     out_csv: str | None = None,
+    results_path: str | None = None,
+    profile_dir: str | None = None,
 ):
     """Точка входа в пайплайн (параметры можно не указывать — будут взяты из config)."""
     leagues = leagues or config.LEAGUES
@@ -95,61 +219,51 @@ async def run(
         team_limit = config.TEAM_LIMIT
     matches_per_team = matches_per_team or config.MATCHES_PER_TEAM
     concurrency = concurrency or config.TEAMS_CONCURRENCY
-    out_csv_path = config.OUT_CSV if out_csv is None else out_csv
+    out_csv_path = config.OUT_CSV if out_csv is None else Path(out_csv)
+    results_file = config.MATCH_RESULTS if results_path is None else Path(results_path)
 
     teams_agg: Dict[str, Dict] = {}
+    records: List[Dict] = []
     agg_lock = asyncio.Lock()
     sem = asyncio.Semaphore(concurrency)
+    profiler = make_profiler(profile_dir)
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        async with async_playwright() as pw:
+            browser, context = await launch_browser(pw, headless)
+
+            # Сначала собираем все команды по лигам
+            all_teams = await collect_teams(context, leagues, team_limit)
+
+            # Параллельно обрабатываем команды
+            async def team_task(team_name: str, team_link: str):
+                async with sem:
+                    team_context = context
+                    try:
+                        # Трасса пишется на весь контекст — при профилировании у каждой команды свой
+                        if profiler is not None:
+                            team_context = await new_context(browser)
+                        await process_team(
+                            team_context, team_name, team_link, teams_agg, agg_lock,
+                            on_match=records.append, profiler=profiler, matches_per_team=matches_per_team,
+                        )
+                    except Exception:
+                        pass
+                    finally:
+                        if team_context is not context:
+                            await team_context.close()
+
+            tasks = [asyncio.create_task(team_task(name, link)) for (name, link) in all_teams]
+            await asyncio.gather(*tasks)
+
+            await context.close()
+            await browser.close()
+    finally:
+        # Профиль нужнее всего как раз при падении или Ctrl-C
+        if profiler is not None:
+            profiler.stop()
 
-    async with async_playwright() as pw:
-        browser: Browser = await pw.chromium.launch(
-            headless=headless,
-            args=["--disable-blink-features=AutomationControlled", "--no-sandbox"],
-        )
-        context = await browser.new_context(
-            user_agent=("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                        "AppleWebKit/537.36 (KHTML, like Gecko) "
-                        "Chrome/123.0.0.0 Safari/537.36"),
-            locale="ru-RU",
-            viewport={"width": 1400, "height": 900},
-        )
-
-        # Сначала собираем все команды по лигам
-        league_page = await context.new_page()
-        league_page.set_default_navigation_timeout(config.NAV_TIMEOUT_MS)
-        league_page.set_default_timeout(config.DEF_TIMEOUT_MS)
-
-        all_teams: List[Tuple[str, str]] = []
-        for lid, league_url in enumerate(leagues, start=1):
-            print(f"\n[LEAGUE {lid}/{len(leagues)}] {league_url}")
-            teams = await get_team_links(league_page, league_url)
-            print(f"[INFO] Найдено команд: {len(teams)}")
-            if team_limit is not None:
-                teams = teams[:team_limit]
-                print(f"[INFO] Ограничение: берём первые {len(teams)} команд")
-            all_teams.extend(teams)
-
-        await league_page.close()
-
-        # Параллельно обрабатываем команды
-        async def team_task(team_name: str, team_link: str):
-            async with sem:
-                try:
-                    await process_team(context, team_name, team_link, teams_agg, agg_lock)
-                except Exception:
-                    pass
-
-        tasks = [asyncio.create_task(team_task(name, link)) for (name, link) in all_teams]
-        await asyncio.gather(*tasks)
-
-        await context.close()
-        await browser.close()
-
-    table = compute_sorted_table(teams_agg)
-    write_averages_csv(table, out_csv_path)
-
-    print(f"\n[OK] Готово. Итоговый CSV: {out_csv_path.resolve()}")
-    if table:
-        print("\nПолная таблица (все команды, отсортировано по среднему тоталу ↓):")
-        for i, (name, avg_total, avg_team, avg_opp) in enumerate(table, start=1):
-            print(f"{i:>2}. {name}: {avg_total:.2f} (инд: {avg_team:.2f}, соп: {avg_opp:.2f})")
+    write_match_results(records, results_file)
+    save_report(teams_agg, out_csv_path)
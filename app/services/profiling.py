@@ -0,0 +1,168 @@
+"""
+Профилирование медленных страниц (включается через PROFILE_DIR или --profile-dir).
+
+Для каждого матча пишется трасса Playwright; сохраняется она, только если матч
+медленнее TRACE_SLOW_MS, упал или попал в выборку TRACE_SAMPLE_RATE.
+Опционально: cProfile по event loop (PROFILE_CPU) и лог «зависаний» loop (LOOP_STALL_MS).
+
+Структура каталога запуска:
+    <PROFILE_DIR>/<YYYYmmdd-HHMMSS>-<pid>/
+        index.jsonl                  # по строке на попытку матча: команда, ID, время, причина трассы
+        <команда>/<match_id>-<N>.zip # трассы N-й попытки: playwright show-trace <файл>
+        cpu.prof, cpu.txt            # cProfile (pstats) и топ по cumulative
+        loop_stalls.log              # медленные колбэки asyncio
+"""
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Optional
+import asyncio
+import cProfile
+import hashlib
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+
+from playwright.async_api import BrowserContext
+
+from app import config
+from app.utils import extract_match_id, normalize_match_stats_url
+
+
+def _safe_name(name: str) -> str:
+    """Имя команды → имя каталога."""
+    return re.sub(r"[^\w.-]+", "_", name).strip("_") or "team"
+
+
+def _trace_match_id(match_url: str) -> str:
+    """ID матча для трассы и index.jsonl; без ID в URL — короткий хеш нормализованного URL."""
+    match_id = extract_match_id(match_url)
+    if match_id:
+        return match_id
+    digest = hashlib.sha1(normalize_match_stats_url(match_url).encode("utf-8")).hexdigest()
+    return f"url-{digest[:12]}"
+
+
+class RunProfiler:
+    """Хуки профилирования одного запуска."""
+
+    def __init__(
+        self,
+        root: Path,
+        slow_ms: int = 5000,
+        sample_rate: float = 0.0,
+        cpu: bool = False,
+        loop_stall_ms: int = 0,
+    ):
+        self.run_dir = Path(root) / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.cpu = cpu
+        self.loop_stall_ms = loop_stall_ms
+        self.traces_saved = 0
+        self._attempts: Dict[tuple, int] = {}
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._stall_handler: Optional[logging.Handler] = None
+        self._debug_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_was_debug = False
+
+    def start(self):
+        """Запуск профилировщиков; вызывать внутри работающего event loop."""
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        if self.loop_stall_ms > 0:
+            # Debug-режим asyncio замедляет каждый колбэк: замеры времени матчей завышаются
+            loop = asyncio.get_running_loop()
+            self._debug_loop, self._loop_was_debug = loop, loop.get_debug()
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.loop_stall_ms / 1000
+            self._stall_handler = logging.FileHandler(self.run_dir / "loop_stalls.log", encoding="utf-8")
+            self._stall_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logging.getLogger("asyncio").addHandler(self._stall_handler)
+        if self.cpu:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        print(f"[PROFILE] Каталог запуска: {self.run_dir.resolve()}")
+
+    def stop(self):
+        """Останавливаем профилировщики и сбрасываем результаты на диск."""
+        try:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+                self._cprofile.dump_stats(self.run_dir / "cpu.prof")
+                with (self.run_dir / "cpu.txt").open("w", encoding="utf-8") as f:
+                    pstats.Stats(self._cprofile, stream=f).sort_stats("cumulative").print_stats(50)
+        finally:
+            self._cprofile = None
+            if self._debug_loop is not None:
+                self._debug_loop.set_debug(self._loop_was_debug)
+                self._debug_loop = None
+            if self._stall_handler is not None:
+                logging.getLogger("asyncio").removeHandler(self._stall_handler)
+                self._stall_handler.close()
+                self._stall_handler = None
+        print(f"[PROFILE] Сохранено трасс: {self.traces_saved} ({self.run_dir.resolve()})")
+
+    def _keep_reason(self, elapsed_ms: float, ok: bool) -> Optional[str]:
+        if not ok:
+            return "failed"
+        if elapsed_ms >= self.slow_ms:
+            return "slow"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    @asynccontextmanager
+    async def trace_match(self, context: BrowserContext, team_name: str, match_url: str):
+        """Трасса одного матча. Вызывающий код выставляет rec["ok"] = True при успешном парсинге.
+
+        Трассировка охватывает весь контекст, поэтому контекст не должен делиться с другими командами.
+        """
+        match_id = _trace_match_id(match_url)
+        # Повторы матча (ретраи заданий воркера) не должны перезаписывать трассы прошлых попыток
+        key = (team_name, match_id)
+        attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        rec: Dict = {"team": team_name, "match_id": match_id, "attempt": attempt, "url": match_url, "ok": False}
+        try:
+            await context.tracing.start(title=f"{team_name} {match_id}", screenshots=True, snapshots=True)
+        except Exception:
+            pass
+        t0 = time.perf_counter()
+        try:
+            yield rec
+        except Exception as e:
+            rec["error"] = repr(e)
+            raise
+        finally:
+            rec["elapsed_ms"] = round((time.perf_counter() - t0) * 1000)
+            reason = self._keep_reason(rec["elapsed_ms"], rec["ok"])
+            rec["trace_reason"] = reason
+            path = None
+            if reason:
+                path = self.run_dir / _safe_name(team_name) / f"{match_id}-{attempt}.zip"
+                path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                await context.tracing.stop(path=path)
+                if path is not None:
+                    rec["trace"] = str(path.relative_to(self.run_dir))
+                    self.traces_saved += 1
+            except Exception:
+                pass
+            with (self.run_dir / "index.jsonl").open("a", encoding="utf-8") as f:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+def make_profiler(profile_dir: str | None = None) -> Optional[RunProfiler]:
+    """Профилировщик по настройкам из config (None, если профилирование выключено)."""
+    root = profile_dir or config.PROFILE_DIR
+    if not root:
+        return None
+    return RunProfiler(
+        Path(root),
+        slow_ms=config.TRACE_SLOW_MS,
+        sample_rate=config.TRACE_SAMPLE_RATE,
+        cpu=config.PROFILE_CPU,
+        loop_stall_ms=config.LOOP_STALL_MS,
+    )
@@ -0,0 +1,357 @@
+"""
+Общая очередь заданий для распределённого парсинга (coordinator/worker).
+
+Задание (job) — словарь {"id", "kind", "payload", "token", "attempts"}.
+Воркер берёт задание в аренду (lease) на ограниченное время и продлевает её,
+пока работает. Просроченные аренды и упавшие задания возвращаются в очередь,
+пока не исчерпан лимит попыток (после этого статус «dead»).
+Координатор отмечает стадию запуска (run state), чтобы воркеры не завершались,
+пока задания ещё готовятся.
+
+Бэкенды:
+    sqlite:///path/to/queue.db — файл SQLite (можно положить на общий диск);
+    memory://                  — очередь в памяти процесса: локальная замена «сервера очереди»
+                                 для тестов; между процессами не работает, CLI её не принимает.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+# Стадии запуска координатора
+RUN_PREPARING = "preparing"
+RUN_ACTIVE = "running"
+RUN_FINISHED = "finished"
+
+
+class WorkQueue(ABC):
+    """Интерфейс очереди заданий (бэкенд обязан реализовать все абстрактные методы).
+
+    Время аренды — по часам хоста (time.time()).
+    """
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max(1, max_attempts)
+
+    @abstractmethod
+    def clear(self):
+        """Удаляем все задания (новый запуск координатора)."""
+
+    @abstractmethod
+    def enqueue(self, kind: str, payload: Dict) -> int:
+        """Ставим задание в очередь, возвращаем его ID."""
+
+    @abstractmethod
+    def lease(self, owner: str, lease_s: float) -> Optional[Dict]:
+        """Берём следующее задание в аренду (или None, если брать нечего)."""
+
+    @abstractmethod
+    def heartbeat(self, job_id: int, token: str, lease_s: float) -> bool:
+        """Продлеваем аренду. False — аренда уже потеряна."""
+
+    @abstractmethod
+    def complete(self, job_id: int, token: str, result: Any) -> bool:
+        """Сохраняем результат. Принимается только от текущего арендатора."""
+
+    @abstractmethod
+    def fail(self, job_id: int, token: str, error: str) -> bool:
+        """Отмечаем неудачу: задание вернётся в очередь или станет «dead»."""
+
+    @abstractmethod
+    def requeue_expired(self) -> int:
+        """Возвращаем в очередь задания с просроченной арендой."""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Количество заданий по статусам."""
+
+    @abstractmethod
+    def results(self) -> List[Tuple[int, Any]]:
+        """Результаты выполненных заданий: [(job_id, result), ...]."""
+
+    @abstractmethod
+    def set_run_state(self, state: str):
+        """Отмечаем стадию запуска (RUN_PREPARING / RUN_ACTIVE / RUN_FINISHED)."""
+
+    @abstractmethod
+    def run_state(self) -> Optional[str]:
+        """Текущая стадия запуска (None — координатор ещё не запускался)."""
+
+    def is_drained(self) -> bool:
+        """Нет ни ожидающих, ни арендованных заданий."""
+        s = self.stats()
+        return s.get(PENDING, 0) == 0 and s.get(LEASED, 0) == 0
+
+
+# -------------------- SQLite --------------------
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind          TEXT    NOT NULL,
+    payload       TEXT    NOT NULL,
+    status        TEXT    NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    lease_owner   TEXT,
+    lease_token   TEXT,
+    lease_expires REAL,
+    result        TEXT,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """Очередь в файле SQLite.
+
+    Журнал оставлен в режиме по умолчанию (DELETE): WAL не работает на сетевых дисках.
+    Соединение открывается на каждую операцию, поэтому методы можно звать из asyncio.to_thread.
+    """
+
+    def __init__(self, path: Path, max_attempts: int = 3, busy_timeout_s: float = 30.0):
+        super().__init__(max_attempts)
+        self.path = Path(path)
+        self.busy_timeout_s = busy_timeout_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s)
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> "_Tx":
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None)
+        return _Tx(conn)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs")
+
+    def enqueue(self, kind: str, payload: Dict) -> int:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO jobs(kind, payload) VALUES (?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False)),
+            )
+            return cur.lastrowid
+
+    def lease(self, owner: str, lease_s: float) -> Optional[Dict]:
+        with self._connect() as conn:
+            self._requeue_expired(conn)
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs WHERE status = ? ORDER BY id LIMIT 1",
+                (PENDING,),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kind, payload, attempts = row
+            token = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_token = ?, lease_expires = ? WHERE id = ?",
+                (LEASED, owner, token, time.time() + lease_s, job_id),
+            )
+        return {"id": job_id, "kind": kind, "payload": json.loads(payload), "token": token, "attempts": attempts + 1}
+
+    def heartbeat(self, job_id: int, token: str, lease_s: float) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND lease_token = ?",
+                (time.time() + lease_s, job_id, LEASED, token),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: int, token: str, result: Any) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_token = NULL, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND lease_token = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), job_id, LEASED, token),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id: int, token: str, error: str) -> bool:
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = ?, lease_token = NULL, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND lease_token = ?",
+                (self.max_attempts, DEAD, PENDING, error, job_id, LEASED, token),
+            )
+            return cur.rowcount == 1
+
+    def requeue_expired(self) -> int:
+        with self._connect() as conn:
+            return self._requeue_expired(conn)
+
+    def _requeue_expired(self, conn: sqlite3.Connection) -> int:
+        cur = conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+            "error = 'lease expired', lease_token = NULL, lease_expires = NULL "
+            "WHERE status = ? AND lease_expires < ?",
+            (self.max_attempts, DEAD, PENDING, LEASED, time.time()),
+        )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: cnt for status, cnt in rows}
+
+    def results(self) -> List[Tuple[int, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, result FROM jobs WHERE status = ? ORDER BY id", (DONE,)).fetchall()
+        return [(job_id, json.loads(result)) for job_id, result in rows]
+
+    def set_run_state(self, state: str):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('run_state', ?)", (state,))
+
+    def run_state(self) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'run_state'").fetchone()
+        return row[0] if row else None
+
+
+class _Tx:
+    """Соединение SQLite как контекст: BEGIN IMMEDIATE … COMMIT/ROLLBACK, затем close()."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.conn.close()
+
+
+# -------------------- В памяти --------------------
+class MemoryWorkQueue(WorkQueue):
+    """Очередь в памяти процесса: локальная замена общего бэкенда для тестов и отладки."""
+
+    def __init__(self, max_attempts: int = 3):
+        super().__init__(max_attempts)
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Dict] = {}
+        self._next_id = 1
+        self._run_state: Optional[str] = None
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+
+    def enqueue(self, kind: str, payload: Dict) -> int:
+        with self._lock:
+            job_id = self._next_id
+            self._next_id += 1
+            self._jobs[job_id] = {
+                "kind": kind, "payload": payload, "status": PENDING, "attempts": 0,
+                "token": None, "expires": None, "result": None, "error": None,
+            }
+            return job_id
+
+    def lease(self, owner: str, lease_s: float) -> Optional[Dict]:
+        with self._lock:
+            self._requeue_expired()
+            for job_id, j in self._jobs.items():
+                if j["status"] != PENDING:
+                    continue
+                j.update(status=LEASED, token=uuid.uuid4().hex, owner=owner, expires=time.time() + lease_s)
+                j["attempts"] += 1
+                return {"id": job_id, "kind": j["kind"], "payload": j["payload"],
+                        "token": j["token"], "attempts": j["attempts"]}
+            return None
+
+    def _leased(self, job_id: int, token: str) -> Optional[Dict]:
+        j = self._jobs.get(job_id)
+        if j is None or j["status"] != LEASED or j["token"] != token:
+            return None
+        return j
+
+    def heartbeat(self, job_id: int, token: str, lease_s: float) -> bool:
+        with self._lock:
+            j = self._leased(job_id, token)
+            if j is None:
+                return False
+            j["expires"] = time.time() + lease_s
+            return True
+
+    def complete(self, job_id: int, token: str, result: Any) -> bool:
+        with self._lock:
+            j = self._leased(job_id, token)
+            if j is None:
+                return False
+            j.update(status=DONE, result=result, error=None, token=None, expires=None)
+            return True
+
+    def fail(self, job_id: int, token: str, error: str) -> bool:
+        with self._lock:
+            j = self._leased(job_id, token)
+            if j is None:
+                return False
+            self._release(j, error)
+            return True
+
+    def requeue_expired(self) -> int:
+        with self._lock:
+            return self._requeue_expired()
+
+    def _requeue_expired(self) -> int:
+        now, n = time.time(), 0
+        for j in self._jobs.values():
+            if j["status"] == LEASED and j["expires"] < now:
+                self._release(j, "lease expired")
+                n += 1
+        return n
+
+    def _release(self, j: Dict, error: str):
+        status = DEAD if j["attempts"] >= self.max_attempts else PENDING
+        j.update(status=status, error=error, token=None, expires=None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out: Dict[str, int] = {}
+            for j in self._jobs.values():
+                out[j["status"]] = out.get(j["status"], 0) + 1
+            return out
+
+    def results(self) -> List[Tuple[int, Any]]:
+        with self._lock:
+            return [(job_id, j["result"]) for job_id, j in self._jobs.items() if j["status"] == DONE]
+
+    def set_run_state(self, state: str):
+        with self._lock:
+            self._run_state = state
+
+    def run_state(self) -> Optional[str]:
+        with self._lock:
+            return self._run_state
+
+
+def open_work_queue(url: str, max_attempts: int = 3) -> WorkQueue:
+    """Открываем очередь по URL: sqlite:///path/to/file.db или memory://."""
+    if url.startswith("memory://"):
+        return MemoryWorkQueue(max_attempts=max_attempts)
+    if url.startswith("sqlite:///"):
+        return SQLiteWorkQueue(Path(url[len("sqlite:///"):]), max_attempts=max_attempts)
+    if url.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteWorkQueue(Path(url), max_attempts=max_attempts)
+    raise ValueError(f"Неизвестный бэкенд очереди: {url}")
@@ -4,10 +4,18 @@
     python main.py
     python main.py --headless 1 --teams-limit 5 --matches 10 --concurrency 5 --csv out.csv
     python main.py   --leagues "https://www.flashscorekz.com/football/england/premier-league-2024-2025/standings/#/lAkHuyP3/table/overall,https://www.flashscorekz.com/football/spain/laliga-2024-2025/#/dINOZk9Q/table/overall"
+
+Распределённый режим (общая очередь):
+    python main.py --teams-limit 5 coordinator --queue sqlite:////mnt/shared/queue.db
+    python main.py --concurrency 3 worker --queue sqlite:////mnt/shared/queue.db
+
+Только отчёт (без браузера, по сохранённым результатам матчей):
+    python main.py --csv out.csv report
+
+Модули скрапера (Playwright) импортируются лениво — только когда нужен парсинг.
 """
 import argparse
-import asyncio
-from app.services.pipeline import run
+from app import config
 
 def parse_args():
     p = argparse.ArgumentParser(description="Парсер угловых (последние N матчей) для команд из нескольких лиг Flashscore + CSV.")
@@ -17,12 +25,74 @@ def parse_args():
     p.add_argument("--matches", type=int, help="Сколько последних матчей на команду брать.")
     p.add_argument("--concurrency", type=int, help="Сколько команд обрабатывать параллельно.")
     p.add_argument("--csv", type=str, help="Путь к выходному CSV.")
+    p.add_argument("--results", type=str, help="Путь к файлу записей по матчам (JSON Lines).")
+    p.add_argument("--profile-dir", type=str, help="Каталог для трасс Playwright и профилей (включает профилирование).")
+
+    sub = p.add_subparsers(dest="command")
+    c = sub.add_parser("coordinator", help="Поставить задания в общую очередь и собрать результаты воркеров.")
+    c.add_argument("--queue", type=str, help="Очередь: sqlite:///path/to/queue.db (файл на общем диске).")
+    c.add_argument("--jobs", type=str, choices=config.JOB_KINDS, default="team", help="Гранулярность заданий: команда или матч.")
+    w = sub.add_parser("worker", help="Выполнять задания из общей очереди.")
+    w.add_argument("--queue", type=str, help="Очередь: sqlite:///path/to/queue.db (файл на общем диске).")
+    w.add_argument("--worker-id", type=str, help="Имя воркера (по умолчанию host-pid).")
+    sub.add_parser("report", help="Пересчитать CSV и таблицу по сохранённым результатам матчей, без браузера.")
     return p.parse_args()
 
+def report(args):
+    """Отчёт по сохранённым записям матчей: Playwright не импортируется."""
+    from pathlib import Path
+    from app.services.aggregator import build_team_agg, read_match_results, save_report
+
+    results_file = config.MATCH_RESULTS if args.results is None else Path(args.results)
+    out_csv_path = config.OUT_CSV if args.csv is None else Path(args.csv)
+    if not results_file.exists():
+        raise SystemExit(f"[ERR] Нет файла результатов матчей: {results_file} (сначала выполните парсинг)")
+    save_report(build_team_agg(read_match_results(results_file)), out_csv_path)
+
 def main():
     args = parse_args()
+    if args.command == "report":
+        report(args)
+        return
+
+    import asyncio
+
     leagues = args.leagues.split(",") if args.leagues else None
     headless = None if args.headless is None else bool(args.headless)
+
+    if args.command in ("coordinator", "worker"):
+        queue_url = args.queue or config.QUEUE_URL
+        if queue_url.startswith("memory://"):
+            # Очередь в памяти не видна другим процессам: координатор ждал бы воркеров вечно
+            raise SystemExit("[ERR] memory:// нельзя использовать между процессами, укажите sqlite:///path/to/queue.db")
+
+        from app.services.distributed import run_coordinator, run_worker
+        from app.services.work_queue import open_work_queue
+
+        queue = open_work_queue(queue_url, max_attempts=config.JOB_MAX_ATTEMPTS)
+        if args.command == "coordinator":
+            asyncio.run(run_coordinator(
+                queue,
+                leagues=leagues,
+                headless=headless,
+                team_limit=args.teams_limit,
+                matches_per_team=args.matches,
+                job_kind=args.jobs,
+                out_csv=args.csv,
+                results_path=args.results,
+            ))
+        else:
+            asyncio.run(run_worker(
+                queue,
+                worker_id=args.worker_id,
+                headless=headless,
+                concurrency=args.concurrency,
+                profile_dir=args.profile_dir,
+            ))
+        return
+
+    from app.services.pipeline import run
+
     asyncio.run(run(
         leagues=leagues,
         headless=headless,
@@ -30,6 +100,8 @@ def main():
         matches_per_team=args.matches,
         concurrency=args.concurrency,
         out_csv=args.csv,
+        results_path=args.results,
+        profile_dir=args.profile_dir,
     ))
 
 if __name__ == "__main__":
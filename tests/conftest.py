@@ -0,0 +1,12 @@
+import sys
+import types
+
+try:
+    import playwright.async_api  # noqa: F401
+except ImportError:
+    # Браузер тестам не нужен: подставляем пустой модуль только ради импорта app.services.*
+    _stub = types.ModuleType("playwright.async_api")
+    for _name in ("async_playwright", "Browser", "BrowserContext", "Page", "Playwright", "TimeoutError"):
+        setattr(_stub, _name, type(_name, (Exception,), {}))
+    sys.modules["playwright"] = types.ModuleType("playwright")
+    sys.modules["playwright.async_api"] = _stub
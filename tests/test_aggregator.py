@@ -0,0 +1,37 @@
+from app.services.aggregator import build_team_agg, compute_sorted_table, select_match_records
+
+
+def _rec(team, match_id, team_c, opp_c):
+    return {"team": team, "match_id": match_id, "url": f"u/{match_id}", "team_corners": team_c, "opp_corners": opp_c}
+
+
+def test_build_team_agg_counts_each_match_once():
+    records = [
+        _rec("Арсенал", "a1", 6, 3),
+        _rec("Арсенал", "a1", 6, 3),
+        _rec("Арсенал", "a2", 4, 5),
+        _rec("Челси", "a1", 3, 6),
+    ]
+    agg = build_team_agg(records)
+    assert agg["Арсенал"] == {"cnt": 2, "sum_total": 18, "sum_team": 10, "sum_opp": 8}
+    assert agg["Челси"]["cnt"] == 1
+    assert compute_sorted_table(agg)[0] == ("Арсенал", 9.0, 5.0, 4.0)
+
+
+def test_build_team_agg_falls_back_to_url():
+    records = [_rec("Арсенал", None, 1, 1), _rec("Арсенал", None, 1, 1)]
+    records[1]["url"] = "u/other"
+    assert build_team_agg(records)["Арсенал"]["cnt"] == 2
+
+
+def test_select_match_records_keeps_first_n_per_team():
+    records = [
+        _rec("Арсенал", "a1", 1, 1),
+        _rec("Арсенал", "a1", 1, 1),
+        _rec("Челси", "c1", 2, 2),
+        _rec("Арсенал", "a2", 3, 3),
+        _rec("Арсенал", "a3", 4, 4),
+    ]
+    picked = select_match_records(records, per_team_limit=2)
+    assert [(r["team"], r["match_id"]) for r in picked] == [("Арсенал", "a1"), ("Челси", "c1"), ("Арсенал", "a2")]
+    assert len(select_match_records(records)) == 4
@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from app import config
+from app.services import distributed
+from app.services.aggregator import read_match_results
+from app.services.work_queue import DEAD, DONE, RUN_FINISHED, RUN_PREPARING, MemoryWorkQueue
+
+
+def _rec(team, match_id):
+    return {"team": team, "match_id": match_id, "url": f"u/{match_id}", "team_corners": 5, "opp_corners": 4}
+
+
+def _fake_process_team(candidates, records):
+    async def process_team(context, team_name, team_link, teams_agg, agg_lock,
+                           on_match=None, on_candidates=None, profiler=None, matches_per_team=None):
+        on_candidates(candidates)
+        for r in records[:matches_per_team]:
+            on_match(r)
+        return len(records)
+    return process_team
+
+
+def _team_job(matches=3):
+    return {"id": 1, "kind": "team", "payload": {"team": "Арсенал", "link": "l", "matches": matches}}
+
+
+@pytest.mark.parametrize("candidates, found, accept_partial, ok", [
+    (5, 3, False, True),    # собрали сколько просили
+    (2, 2, False, True),    # кандидатов меньше лимита
+    (0, 0, False, True),    # у команды нет матчей — повторять нечего
+    (5, 1, False, False),   # неполный результат — в очередь
+    (5, 1, True, True),     # последняя попытка — принимаем частичный
+    (5, 0, True, False),    # пустой результат не принимаем никогда
+])
+def test_team_job_completeness(monkeypatch, candidates, found, accept_partial, ok):
+    records = [_rec("Арсенал", f"m{i}") for i in range(found)]
+    monkeypatch.setattr(distributed, "process_team", _fake_process_team(candidates, records))
+    run = distributed.execute_job(None, _team_job(), accept_partial=accept_partial)
+    if ok:
+        assert asyncio.run(run) == records
+    else:
+        with pytest.raises(distributed.IncompleteJobError):
+            asyncio.run(run)
+
+
+def _flaky(errors):
+    calls = []
+
+    def method():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return method, calls
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(distributed.asyncio, "sleep", lambda _s: real_sleep(0))
+
+
+def test_queue_call_retries_lock_errors(no_sleep):
+    method, calls = _flaky([distributed.sqlite3.OperationalError("database is locked")] * 2)
+    assert asyncio.run(distributed._queue_call(method)) == "ok"
+    assert len(calls) == 3
+
+
+def test_queue_call_raises_permanent_errors(no_sleep):
+    method, calls = _flaky([distributed.sqlite3.OperationalError("unable to open database file")])
+    with pytest.raises(distributed.sqlite3.OperationalError):
+        asyncio.run(distributed._queue_call(method))
+    assert len(calls) == 1
+
+
+def test_queue_call_gives_up_after_attempts(no_sleep):
+    errors = [distributed.sqlite3.OperationalError("database is locked")] * distributed.QUEUE_CALL_ATTEMPTS
+    method, calls = _flaky(errors)
+    with pytest.raises(distributed.sqlite3.OperationalError):
+        asyncio.run(distributed._queue_call(method))
+    assert len(calls) == distributed.QUEUE_CALL_ATTEMPTS
+
+
+class _FakeClosable:
+    async def close(self):
+        pass
+
+
+class _FakePlaywright:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def fake_browser(monkeypatch):
+    """Координатор и воркер без браузера: команды и задания подменяются в тестах."""
+    async def launch_browser(pw, headless):
+        return _FakeClosable(), _FakeClosable()
+
+    monkeypatch.setattr(distributed, "async_playwright", _FakePlaywright)
+    monkeypatch.setattr(distributed, "launch_browser", launch_browser)
+    monkeypatch.setattr(config, "QUEUE_POLL_MS", 5)
+
+
+def _patch_teams(monkeypatch, teams):
+    async def collect_teams(context, leagues, team_limit):
+        return teams
+    monkeypatch.setattr(distributed, "collect_teams", collect_teams)
+
+
+def _patch_jobs(monkeypatch, failures):
+    """Задание команды падает failures[team] раз (None — всегда), затем отдаёт один матч."""
+    async def execute_job(context, job, profiler=None, accept_partial=False):
+        team = job["payload"]["team"]
+        left = failures.get(team, 0)
+        if left is None or left > 0:
+            if left:
+                failures[team] = left - 1
+            raise RuntimeError("timeout")
+        return [_rec(team, f"{team}-m1")]
+    monkeypatch.setattr(distributed, "execute_job", execute_job)
+
+
+def _run_cluster(queue, tmp_path, workers=2):
+    async def main():
+        await asyncio.gather(
+            distributed.run_coordinator(
+                queue, leagues=["league"], out_csv=str(tmp_path / "out.csv"),
+                results_path=str(tmp_path / "results.jsonl"),
+            ),
+            *(distributed.run_worker(queue, worker_id=f"w{i}", concurrency=2, idle_timeout_s=60)
+              for i in range(workers)),
+        )
+    asyncio.run(asyncio.wait_for(main(), timeout=10))
+
+
+def test_failed_job_is_retried_and_duplicates_merged_once(fake_browser, monkeypatch, tmp_path):
+    queue = MemoryWorkQueue(max_attempts=3)
+    # Одна команда дважды (например, из двух лиг) — её матч должен учитываться один раз
+    _patch_teams(monkeypatch, [("Арсенал", "l1"), ("Арсенал", "l1"), ("Челси", "l2")])
+    _patch_jobs(monkeypatch, {"Челси": 2})
+
+    _run_cluster(queue, tmp_path)  # воркеры завершаются по RUN_FINISHED, а не по простою
+
+    assert queue.stats() == {DONE: 3}
+    assert queue.run_state() == RUN_FINISHED
+    records = read_match_results(tmp_path / "results.jsonl")
+    assert sorted(r["match_id"] for r in records) == ["Арсенал-m1", "Челси-m1"]
+    assert (tmp_path / "out.csv").read_text(encoding="utf-8").splitlines() == [
+        "Арсенал,9.00,5.00,4.00",
+        "Челси,9.00,5.00,4.00",
+    ]
+
+
+def test_job_goes_dead_after_max_attempts(fake_browser, monkeypatch, tmp_path):
+    queue = MemoryWorkQueue(max_attempts=2)
+    _patch_teams(monkeypatch, [("Арсенал", "l1"), ("Челси", "l2")])
+    _patch_jobs(monkeypatch, {"Челси": None})
+
+    _run_cluster(queue, tmp_path, workers=1)
+
+    assert queue.stats() == {DONE: 1, DEAD: 1}
+    assert [r["team"] for r in read_match_results(tmp_path / "results.jsonl")] == ["Арсенал"]
+
+
+def test_worker_waits_while_preparing_and_exits_on_finished(fake_browser):
+    queue = MemoryWorkQueue()
+    queue.set_run_state(RUN_PREPARING)
+
+    async def main():
+        # idle_timeout_s=0: при подготовке простой не считается, иначе воркер вышел бы сразу
+        worker = asyncio.create_task(distributed.run_worker(queue, concurrency=1, idle_timeout_s=0))
+        await asyncio.sleep(0.05)
+        assert not worker.done()
+        queue.set_run_state(RUN_FINISHED)
+        await asyncio.wait_for(worker, timeout=2)
+
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.profiling import RunProfiler, _trace_match_id
+
+
+class _FakeTracing:
+    def __init__(self):
+        self.started = 0
+        self.stopped_paths = []
+
+    async def start(self, **kwargs):
+        self.started += 1
+
+    async def stop(self, path=None):
+        self.stopped_paths.append(path)
+        if path is not None:
+            path.write_bytes(b"trace")
+
+
+class _FakeContext:
+    def __init__(self):
+        self.tracing = _FakeTracing()
+
+
+URL = "https://www.flashscorekz.com/match/football/abc123/#/match-summary/match-statistics/0"
+
+
+def _index(profiler):
+    lines = (profiler.run_dir / "index.jsonl").read_text(encoding="utf-8").splitlines()
+    return [json.loads(line) for line in lines]
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    p = RunProfiler(tmp_path, slow_ms=10_000)
+    p.run_dir.mkdir(parents=True)
+    return p
+
+
+def test_trace_match_id():
+    assert _trace_match_id(URL) == "abc123"
+    fallback = _trace_match_id("https://x/game/1")
+    assert fallback.startswith("url-")
+    assert _trace_match_id("https://x/game/1/#/match-summary/match-statistics/0") == fallback
+    assert _trace_match_id("https://x/game/2") != fallback
+
+
+def test_keep_reason(tmp_path):
+    p = RunProfiler(tmp_path, slow_ms=100, sample_rate=0.0)
+    assert p._keep_reason(10, ok=False) == "failed"
+    assert p._keep_reason(100, ok=True) == "slow"
+    assert p._keep_reason(10, ok=True) is None
+    p.sample_rate = 1.0
+    assert p._keep_reason(10, ok=True) == "sampled"
+
+
+def test_fast_match_trace_is_dropped(profiler):
+    ctx = _FakeContext()
+
+    async def run():
+        async with profiler.trace_match(ctx, "Арсенал", URL) as rec:
+            rec["ok"] = True
+
+    asyncio.run(run())
+    assert ctx.tracing.stopped_paths == [None]
+    [row] = _index(profiler)
+    assert row["match_id"] == "abc123"
+    assert row["ok"] is True
+    assert row["trace_reason"] is None
+    assert "trace" not in row
+    assert profiler.traces_saved == 0
+
+
+def test_failed_attempts_keep_separate_traces(profiler):
+    ctx = _FakeContext()
+
+    async def run():
+        async with profiler.trace_match(ctx, "Манчестер Сити", URL):
+            pass  # ok не выставлен — матч не распарсился
+        with pytest.raises(RuntimeError):
+            async with profiler.trace_match(ctx, "Манчестер Сити", URL):
+                raise RuntimeError("timeout")
+
+    asyncio.run(run())
+    first, second = _index(profiler)
+    assert (first["attempt"], first["trace_reason"], first["trace"]) == (1, "failed", "Манчестер_Сити/abc123-1.zip")
+    assert (second["attempt"], second["trace"]) == (2, "Манчестер_Сити/abc123-2.zip")
+    assert second["error"] == "RuntimeError('timeout')"
+    assert (profiler.run_dir / first["trace"]).exists()
+    assert (profiler.run_dir / second["trace"]).exists()
+    assert profiler.traces_saved == 2
+
+
+def test_start_stop_restores_loop_and_writes_profile(tmp_path):
+    p = RunProfiler(tmp_path, cpu=True, loop_stall_ms=50)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        was_debug = loop.get_debug()
+        p.start()
+        assert loop.get_debug()
+        p.stop()
+        assert loop.get_debug() == was_debug
+
+    asyncio.run(run())
+    assert (p.run_dir / "cpu.prof").exists()
+    assert (p.run_dir / "cpu.txt").exists()
@@ -0,0 +1,48 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Отдельный интерпретатор: другие тесты могут подставлять playwright в sys.modules
+_RUN_REPORT = """
+import sys
+sys.argv = ["main.py", "--results", sys.argv[1], "--csv", sys.argv[2], "report"]
+import main
+main.main()
+leaked = sorted(m for m in sys.modules if m.split(".")[0] == "playwright" or m.startswith("app.scraper"))
+print("LEAKED:", leaked)
+"""
+
+
+def test_report_rebuilds_csv_without_playwright(tmp_path):
+    results = tmp_path / "results.jsonl"
+    records = [
+        {"team": "Арсенал", "match_id": "a1", "url": "u/a1", "team_corners": 6, "opp_corners": 3},
+        {"team": "Арсенал", "match_id": "a1", "url": "u/a1", "team_corners": 6, "opp_corners": 3},
+        {"team": "Арсенал", "match_id": "a2", "url": "u/a2", "team_corners": 4, "opp_corners": 5},
+        {"team": "Челси", "match_id": "c1", "url": "u/c1", "team_corners": 2, "opp_corners": 2},
+    ]
+    results.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    out_csv = tmp_path / "out.csv"
+
+    proc = subprocess.run(
+        [sys.executable, "-c", _RUN_REPORT, str(results), str(out_csv)],
+        cwd=ROOT, capture_output=True, text=True, encoding="utf-8", check=True,
+    )
+
+    assert "LEAKED: []" in proc.stdout
+    assert out_csv.read_text(encoding="utf-8").splitlines() == [
+        "Арсенал,9.00,5.00,4.00",
+        "Челси,4.00,2.00,2.00",
+    ]
+
+
+def test_report_without_results_file_fails(tmp_path):
+    proc = subprocess.run(
+        [sys.executable, "main.py", "--results", str(tmp_path / "missing.jsonl"), "report"],
+        cwd=ROOT, capture_output=True, text=True, encoding="utf-8",
+    )
+    assert proc.returncode != 0
+    assert "missing.jsonl" in proc.stderr
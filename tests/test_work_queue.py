@@ -0,0 +1,105 @@
+import pytest
+
+from app.services.work_queue import (
+    DEAD,
+    DONE,
+    PENDING,
+    RUN_ACTIVE,
+    MemoryWorkQueue,
+    SQLiteWorkQueue,
+    WorkQueue,
+    open_work_queue,
+)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def queue(request, tmp_path):
+    if request.param == "memory":
+        return MemoryWorkQueue(max_attempts=2)
+    return SQLiteWorkQueue(tmp_path / "queue.db", max_attempts=2)
+
+
+def test_lease_complete(queue):
+    job_id = queue.enqueue("team", {"team": "Арсенал"})
+    job = queue.lease("w1", 60)
+    assert job["id"] == job_id
+    assert job["payload"] == {"team": "Арсенал"}
+    assert job["attempts"] == 1
+    assert queue.lease("w2", 60) is None
+    assert not queue.is_drained()
+
+    assert queue.complete(job_id, job["token"], [{"x": 1}])
+    assert queue.results() == [(job_id, [{"x": 1}])]
+    assert queue.stats() == {DONE: 1}
+    assert queue.is_drained()
+
+
+def test_expired_lease_is_requeued(queue):
+    job_id = queue.enqueue("team", {})
+    queue.lease("w1", -1)  # аренда уже просрочена
+    assert queue.requeue_expired() == 1
+    assert queue.stats() == {PENDING: 1}
+
+    job = queue.lease("w2", 60)
+    assert job["id"] == job_id
+    assert job["attempts"] == 2
+
+
+def test_stale_token_is_rejected(queue):
+    job_id = queue.enqueue("team", {})
+    stale = queue.lease("w1", -1)
+    fresh = queue.lease("w2", 60)  # lease() сам возвращает просроченные задания
+    assert fresh["id"] == job_id
+
+    assert not queue.heartbeat(job_id, stale["token"], 60)
+    assert not queue.complete(job_id, stale["token"], ["stale"])
+    assert not queue.fail(job_id, stale["token"], "stale")
+    assert queue.heartbeat(job_id, fresh["token"], 60)
+    assert queue.complete(job_id, fresh["token"], ["fresh"])
+    assert queue.results() == [(job_id, ["fresh"])]
+
+
+def test_fail_retries_then_dead(queue):
+    job_id = queue.enqueue("match", {})
+    job = queue.lease("w1", 60)
+    assert queue.fail(job_id, job["token"], "boom")
+    assert queue.stats() == {PENDING: 1}
+
+    job = queue.lease("w1", 60)
+    assert queue.fail(job_id, job["token"], "boom")
+    assert queue.stats() == {DEAD: 1}
+    assert queue.lease("w1", 60) is None
+    assert queue.is_drained()
+
+
+def test_expired_lease_goes_dead_at_max_attempts(queue):
+    queue.enqueue("team", {})
+    queue.lease("w1", -1)
+    queue.lease("w2", -1)
+    assert queue.requeue_expired() == 1
+    assert queue.stats() == {DEAD: 1}
+
+
+def test_clear_and_run_state(queue):
+    queue.enqueue("team", {})
+    assert queue.run_state() is None
+    queue.set_run_state(RUN_ACTIVE)
+    assert queue.run_state() == RUN_ACTIVE
+    queue.clear()
+    assert queue.stats() == {}
+
+
+def test_open_work_queue(tmp_path):
+    assert isinstance(open_work_queue("memory://"), MemoryWorkQueue)
+    assert isinstance(open_work_queue(f"sqlite:///{tmp_path / 'q.db'}"), SQLiteWorkQueue)
+    with pytest.raises(ValueError):
+        open_work_queue("redis://localhost")
+
+
+def test_incomplete_backend_fails_on_instantiation():
+    class HalfQueue(WorkQueue):
+        def clear(self):
+            pass
+
+    with pytest.raises(TypeError):
+        HalfQueue()